@@ -1,132 +1,596 @@
-"""
--------------------------------------------------------
-Python File: copy_files.py
-Author     : Damien Keffyn
-Company    : Sentinal IT
-Date       : September 26, 2024
-Description: 
-    This script allows the user to select a source 
-    and destination directory, and recursively copies 
-    all files and folders from the source to the destination, 
-    ignoring hidden files and folders, skipping files that result 
-    in access errors, and excluding specified file types. It 
-    also logs each file operation and provides a progress bar for 
-    large copy operations.
-
-Features:
-    - Ignores hidden files and folders during the copy operation.
-    - Allows the user to exclude specific file types from being copied.
-    - Logs copied files, skipped files, and errors into 'copy_log.txt'.
-    - Displays a progress bar to indicate the progress of large operations.
-    - Skips files that cause access errors and continues copying.
-    - Maintains the directory structure from the source to the destination.
-    - Uses os.walk() to recursively walk through directories.
-    - Cross-platform compatibility for Windows and Unix-like systems.
-
-Requirements:
-    - Install the 'tqdm' library for the progress bar:
-        pip install tqdm
-
-Usage:
-    1. Run the script using Python.
-    2. Enter the source and destination directories when prompted.
-    3. Optionally, enter file types (extensions) to exclude from the copy.
-    4. The script will display a progress bar and log each operation 
-       to 'copy_log.txt'.
-
--------------------------------------------------------
-"""
-
-import os
-import shutil
-import fnmatch
-import sys
-import logging
-from tqdm import tqdm  # Progress bar library
-
-# Set up logging
-logging.basicConfig(filename='copy_log.txt', level=logging.INFO,
-                    format='%(asctime)s - %(levelname)s - %(message)s')
-
-# Function to check if a file or folder is hidden
-def is_hidden(filepath):
-    name = os.path.basename(os.path.abspath(filepath))
-    if sys.platform == 'win32':
-        try:
-            import ctypes
-            attrs = ctypes.windll.kernel32.GetFileAttributesW(filepath)
-            return attrs & 2  # FILE_ATTRIBUTE_HIDDEN = 0x2
-        except:
-            return False
-    else:
-        return name.startswith('.')
-
-# Function to copy files and folders, ignoring hidden files/folders, and excluding certain file types
-def copy_files_and_folders(src, dst, exclude_extensions):
-    total_files = sum([len(files) for _, _, files in os.walk(src)])
-    copied_files = 0
-
-    # Initialize progress bar
-    with tqdm(total=total_files, unit="file") as progress_bar:
-        for root, dirs, files in os.walk(src):
-            # Remove hidden directories from the list so they are not traversed
-            dirs[:] = [d for d in dirs if not is_hidden(os.path.join(root, d))]
-
-            for file in files:
-                # Skip hidden files
-                if is_hidden(os.path.join(root, file)):
-                    logging.info(f"Skipped hidden file: {os.path.join(root, file)}")
-                    continue
-
-                # Skip files with excluded extensions
-                if any(fnmatch.fnmatch(file, f"*.{ext}") for ext in exclude_extensions):
-                    logging.info(f"Skipped excluded file type: {os.path.join(root, file)}")
-                    continue
-
-                # Construct full file path
-                src_file = os.path.join(root, file)
-                rel_path = os.path.relpath(root, src)
-                dest_dir = os.path.join(dst, rel_path)
-
-                # Create the destination directory if it doesn't exist
-                if not os.path.exists(dest_dir):
-                    os.makedirs(dest_dir)
-
-                # Copy file, handling "Access Denied" or other errors
-                try:
-                    shutil.copy2(src_file, dest_dir)
-                    logging.info(f"Copied: {src_file} to {dest_dir}")
-                    copied_files += 1
-                except PermissionError:
-                    logging.error(f"Access Denied: {src_file}. Skipping...")
-                except Exception as e:
-                    logging.error(f"Error copying {src_file}: {e}")
-
-                # Update progress bar
-                progress_bar.update(1)
-
-    print(f"Copied {copied_files} files out of {total_files}. Check 'copy_log.txt' for details.")
-
-# Main function to get user input and run the copy operation
-def main():
-    # Get source and destination from user
-    src = input("Enter the source directory: ")
-    dst = input("Enter the destination directory: ")
-
-    # Check if source exists
-    if not os.path.exists(src):
-        print("Source directory does not exist.")
-        return
-
-    # Ask the user for file extensions to exclude
-    exclude_extensions = input("Enter file extensions to exclude (comma-separated, e.g., 'exe,sys,tmp'): ")
-    exclude_extensions = [ext.strip() for ext in exclude_extensions.split(',')]
-
-    # Start the copying process
-    print(f"Starting copy from {src} to {dst} (excluding hidden files and folders)...")
-    logging.info(f"Starting copy operation from {src} to {dst}")
-    copy_files_and_folders(src, dst, exclude_extensions)
-    print("Copy operation completed.")
-
-if __name__ == "__main__":
-    main()
+"""
+-------------------------------------------------------
+Python File: copy_files.py
+Author     : Damien Keffyn
+Company    : Sentinal IT
+Date       : September 26, 2024
+Description: 
+    This script allows the user to select a source 
+    and destination directory, and recursively copies 
+    all files and folders from the source to the destination, 
+    ignoring hidden files and folders, skipping files that result 
+    in access errors, and excluding specified file types. It 
+    also logs each file operation and provides a progress bar for 
+    large copy operations.
+
+Features:
+    - Ignores hidden files and folders during the copy operation.
+    - Allows the user to exclude specific file types from being copied.
+    - Logs copied files, skipped files, and errors into 'copy_log.txt'.
+    - Displays a progress bar to indicate the progress of large operations.
+    - Skips files that cause access errors and continues copying.
+    - Copies several files at once on a thread pool.
+    - Maintains the directory structure from the source to the destination.
+    - Uses os.scandir() to recursively walk through directories in a single pass.
+    - Cross-platform compatibility for Windows and Unix-like systems.
+    - Optionally delegates to robocopy on Windows (--engine robocopy).
+    - Clones files instantly on copy-on-write filesystems (--reflink).
+    - Skips files that are already up to date in the destination (--update).
+    - Can copy files in on-disk (inode) order to cut seeking (--sort-by-inode).
+
+Requirements:
+    - Install the 'tqdm' library for the progress bar:
+        pip install tqdm
+
+Usage:
+    1. Run the script using Python (add '--engine robocopy' on Windows
+       to let robocopy do the copy).
+    2. Enter the source and destination directories when prompted.
+    3. Optionally, enter file types (extensions) to exclude from the copy.
+    4. The script will display a progress bar and log each operation 
+       to 'copy_log.txt'.
+
+-------------------------------------------------------
+"""
+
+import os
+import stat
+import errno
+import shutil
+import re
+import fnmatch
+import sys
+import argparse
+import subprocess
+import queue
+import threading
+import atexit
+import logging
+import logging.handlers
+import mmap
+import ctypes
+import ctypes.util
+from concurrent.futures import ThreadPoolExecutor
+from tqdm import tqdm  # Progress bar library
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# Log handler that collects formatted records in memory and writes them to the file in ~64 KiB chunks
+class BufferedLogHandler(logging.FileHandler):
+    def __init__(self, filename, capacity=65536):
+        # delay=True: the file isn't opened until the first chunk is written
+        super().__init__(filename, delay=True)
+        self.capacity = capacity
+        self.buffer = []
+        self.buffered = 0
+
+    def emit(self, record):
+        try:
+            msg = self.format(record) + self.terminator
+        except Exception:
+            self.handleError(record)
+            return
+        self.buffer.append(msg)
+        self.buffered += len(msg)
+        # Errors are written straight away so they survive a crash
+        if self.buffered >= self.capacity or record.levelno >= logging.ERROR:
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            if not self.buffer:
+                return
+            if self.stream is None:
+                self.stream = self._open()
+            self.stream.write(''.join(self.buffer))
+            self.stream.flush()
+            self.buffer.clear()
+            self.buffered = 0
+
+    def close(self):
+        # FileHandler.close() only flushes an already-open file, so write out what's buffered first
+        self.flush()
+        super().close()
+
+# Set up logging; records go through a queue to a background thread that writes them in large chunks
+_log_handler = BufferedLogHandler('copy_log.txt')
+_log_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+_log_queue = queue.SimpleQueue()
+_log_listener = logging.handlers.QueueListener(_log_queue, _log_handler)
+logging.root.addHandler(logging.handlers.QueueHandler(_log_queue))
+logging.root.setLevel(logging.INFO)
+_log_listener.start()
+
+# Function to drain the log queue and flush buffered records when the script exits
+def _close_logging():
+    _log_listener.stop()
+    _log_handler.close()
+
+atexit.register(_close_logging)
+
+# Function to check if a directory entry is hidden, using the attributes os.scandir() already fetched;
+# the platform check happens once here rather than on every call
+if sys.platform == 'win32':
+    _FILE_ATTRIBUTE_HIDDEN = stat.FILE_ATTRIBUTE_HIDDEN
+
+    def is_hidden(entry):
+        # FindNextFileW filled in the attributes, so this stat() is free
+        return bool(entry.stat(follow_symlinks=False).st_file_attributes & _FILE_ATTRIBUTE_HIDDEN)
+else:
+    def is_hidden(entry):
+        return entry.name.startswith(b'.')
+
+# Function to walk a directory tree with os.scandir(), creating each destination directory and then
+# yielding (entry, dest_dir, dest_file) for the files in it.
+# Paths are bytes throughout, which saves decoding every name the kernel hands back on POSIX.
+def _scan(src, dst, sort_by_inode=False):
+    os.makedirs(dst, exist_ok=True)
+
+    # An explicit stack instead of recursive generators, so each file isn't passed up through
+    # one 'yield from' per level of nesting
+    stack = [(src, dst)]
+    pop, push = stack.pop, stack.append
+    hidden = is_hidden
+    while stack:
+        src, dst = pop()
+        subdirs = []
+        files = []
+        # Join the separator once per directory; destination paths are then plain concatenation
+        dest_sep = os.path.join(dst, b'')
+        try:
+            with os.scandir(src) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        # Hidden directories are not traversed
+                        if not hidden(entry):
+                            subdirs.append(entry)
+                    elif entry.is_symlink() and entry.is_dir():
+                        # Like os.walk(), never follow symlinks to directories
+                        continue
+                    elif hidden(entry):
+                        logging.info(f"Skipped hidden file: {os.fsdecode(entry.path)}")
+                    else:
+                        files.append(entry)
+        except OSError as e:
+            logging.error(f"Error reading directory {os.fsdecode(src)}: {e}")
+            continue
+
+        # Directories are visited parents-first, so one mkdir is enough and files never need to check
+        try:
+            os.mkdir(dst)
+        except FileExistsError:
+            pass
+
+        # Reading in inode order keeps the disk heads (or NFS/SMB server) close to sequential;
+        # on POSIX the inode number comes free with each directory entry
+        if sort_by_inode:
+            files.sort(key=os.DirEntry.inode)
+        for entry in files:
+            yield entry, dst, dest_sep + entry.name
+
+        # Subdirectories are pushed in reverse so they are visited in scandir order, after the
+        # scandir handle is closed so deep trees don't pile up open descriptors
+        for entry in reversed(subdirs):
+            push((entry.path, dest_sep + entry.name))
+
+# Size of the buffer used when the kernel can't copy files for us
+COPY_BUFSIZE = 1024 * 1024
+
+# Errors meaning a zero-copy syscall isn't supported for this pair of files, so try the next method
+_UNSUPPORTED_ERRNOS = {errno.ENOSYS, errno.EXDEV, errno.EINVAL, errno.EOPNOTSUPP,
+                       errno.ENOTSUP, errno.ENOTTY, getattr(errno, 'ENOTSOCK', errno.EINVAL)}
+
+# Function to write a whole buffer, retrying on short writes
+def _write_all(fd, data):
+    while data:
+        data = data[os.write(fd, data):]
+
+# FICLONE ioctl (_IOW(0x94, 9, int)), which clones a whole file on btrfs, xfs and other CoW filesystems
+_FICLONE = 0x40049409 if fcntl is not None and sys.platform.startswith('linux') else None
+
+# clonefile(2) does the same by path on macOS (APFS)
+if sys.platform == 'darwin':
+    _clonefile = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True).clonefile
+    _clonefile.argtypes = [ctypes.c_char_p, ctypes.c_char_p, ctypes.c_uint32]
+else:
+    _clonefile = None
+
+# Function to clone an open file's data blocks into another; returns False if the filesystem can't
+def _try_reflink(src_fd, dst_fd):
+    try:
+        fcntl.ioctl(dst_fd, _FICLONE, src_fd)
+        return True
+    except OSError as e:
+        if e.errno not in _UNSUPPORTED_ERRNOS:
+            raise
+        return False
+
+# Function to clone a file by path with clonefile(); returns False if the filesystem can't
+def _try_clonefile(src, dst):
+    src_b, dst_b = os.fsencode(src), os.fsencode(dst)
+    if _clonefile(src_b, dst_b, 0) == 0:
+        return True
+    err = ctypes.get_errno()
+    # clonefile() won't overwrite, so replace an existing destination like cp --reflink does
+    if err == errno.EEXIST:
+        os.unlink(dst)
+        if _clonefile(src_b, dst_b, 0) == 0:
+            return True
+        err = ctypes.get_errno()
+    if err not in _UNSUPPORTED_ERRNOS:
+        raise OSError(err, os.strerror(err), src)
+    return False
+
+# Files larger than this are copied with O_DIRECT on Linux so they don't flush the page cache
+DIRECT_IO_THRESHOLD = 16 * 1024 * 1024
+
+# O_DIRECT transfers must be aligned to the device's logical block size; 4 KiB covers common disks
+DIRECT_IO_ALIGN = 4096
+
+_O_DIRECT = getattr(os, 'O_DIRECT', 0) if fcntl is not None else 0
+
+# Function to turn O_DIRECT (and O_NOATIME, where permitted) on or off for an open file
+def _set_direct_io(fd, enable):
+    flags = fcntl.fcntl(fd, fcntl.F_GETFL)
+    if not enable:
+        fcntl.fcntl(fd, fcntl.F_SETFL, flags & ~_O_DIRECT)
+        return True
+    # O_NOATIME needs us to own the file, and some filesystems (e.g. tmpfs) refuse O_DIRECT
+    for extra in (_O_DIRECT | getattr(os, 'O_NOATIME', 0), _O_DIRECT):
+        try:
+            fcntl.fcntl(fd, fcntl.F_SETFL, flags | extra)
+            return True
+        except OSError:
+            pass
+    return False
+
+# Function to copy a large file around the page cache; returns False if O_DIRECT isn't usable
+def _direct_copy(src_fd, dst_fd):
+    if not _set_direct_io(src_fd, True):
+        return False
+    if not _set_direct_io(dst_fd, True):
+        _set_direct_io(src_fd, False)
+        return False
+
+    # An anonymous mmap is page-aligned, as O_DIRECT requires
+    with mmap.mmap(-1, COPY_BUFSIZE) as buf, memoryview(buf) as mv:
+        try:
+            n = os.readv(src_fd, [mv])
+        except OSError as e:
+            if e.errno != errno.EINVAL:
+                raise
+            # The filesystem accepted the flag but not the I/O; nothing was read, so fall back
+            _set_direct_io(src_fd, False)
+            _set_direct_io(dst_fd, False)
+            return False
+
+        while n:
+            # The final partial block can't be written unbuffered
+            if n % DIRECT_IO_ALIGN:
+                _set_direct_io(dst_fd, False)
+            try:
+                _write_all(dst_fd, mv[:n])
+            except OSError as e:
+                if e.errno != errno.EINVAL:
+                    raise
+                _set_direct_io(dst_fd, False)
+                _write_all(dst_fd, mv[:n])
+            n = os.readv(src_fd, [mv])
+    return True
+
+# Files up to this size are copied with a single read and a single write
+SMALL_FILE_MAX = 64 * 1024
+
+_thread_local = threading.local()
+
+# Function to return this thread's reusable buffer for small files
+def _small_buffer():
+    buf = getattr(_thread_local, 'small_buffer', None)
+    if buf is None:
+        buf = _thread_local.small_buffer = memoryview(bytearray(SMALL_FILE_MAX))
+    return buf
+
+# Function to copy the contents of one open file to another, using the fastest method available
+def _fastcopy(src_fd, dst_fd, size, reflink='auto'):
+    count = max(size, COPY_BUFSIZE)
+    copied = 0
+
+    # A reflink shares the source's blocks, so nothing is copied at all. For small files 'auto'
+    # skips it: one read and one write cost about as much as an ioctl that may well fail
+    if reflink == 'always' or (reflink == 'auto' and size > SMALL_FILE_MAX):
+        if _FICLONE is not None and _try_reflink(src_fd, dst_fd):
+            return
+        if reflink == 'always':
+            raise OSError(errno.EOPNOTSUPP, "Reflink not supported for this file")
+
+    # Small files (most of a typical source tree) take one read and one write
+    if size <= SMALL_FILE_MAX:
+        if hasattr(os, 'readv'):
+            buf = _small_buffer()
+            n = os.readv(src_fd, [buf])
+            _write_all(dst_fd, buf[:n])
+        else:
+            data = os.read(src_fd, SMALL_FILE_MAX)
+            n = len(data)
+            _write_all(dst_fd, data)
+        # A short read means we hit EOF; otherwise the file grew, so carry on from here
+        if n < SMALL_FILE_MAX:
+            return
+        copied = n
+
+    # Large files are streamed around the page cache; smaller ones stay on the zero-copy paths below
+    if size > DIRECT_IO_THRESHOLD and _O_DIRECT and _direct_copy(src_fd, dst_fd):
+        return
+
+    # copy_file_range lets the kernel copy (or clone, on btrfs/xfs/NFS) without touching user space
+    if hasattr(os, 'copy_file_range'):
+        try:
+            while n := os.copy_file_range(src_fd, dst_fd, count):
+                copied += n
+            # Some filesystems (e.g. procfs) report EOF straight away; only trust it for empty files
+            if copied or not size:
+                return
+        except OSError as e:
+            if e.errno not in _UNSUPPORTED_ERRNOS:
+                raise
+
+    # sendfile still avoids copying through user space; file offsets carry on where we left off
+    if hasattr(os, 'sendfile'):
+        try:
+            while n := os.sendfile(dst_fd, src_fd, None, count):
+                copied += n
+            if copied or not size:
+                return
+        except OSError as e:
+            if e.errno not in _UNSUPPORTED_ERRNOS:
+                raise
+
+    # Fall back to a plain read/write loop with a large buffer
+    if hasattr(os, 'readv'):
+        with memoryview(bytearray(COPY_BUFSIZE)) as buf:
+            while n := os.readv(src_fd, [buf]):
+                _write_all(dst_fd, buf[:n])
+    else:
+        while chunk := os.read(src_fd, COPY_BUFSIZE):
+            _write_all(dst_fd, chunk)
+
+# Whether metadata can be copied through open descriptors (Linux), saving the path lookups shutil.copystat() does
+_FD_METADATA = hasattr(os, 'listxattr') and os.chmod in os.supports_fd and os.utime in os.supports_fd
+
+# Function to copy extended attributes, permissions and timestamps between open files
+def _copymeta(st, src_fd, dst_fd):
+    try:
+        names = os.listxattr(src_fd)
+    except OSError as e:
+        if e.errno not in (errno.ENOTSUP, errno.ENODATA, errno.EINVAL):
+            raise
+        names = []
+    for name in names:
+        try:
+            os.setxattr(dst_fd, name, os.getxattr(src_fd, name))
+        except OSError as e:
+            if e.errno not in (errno.EPERM, errno.ENOTSUP, errno.ENODATA, errno.EINVAL):
+                raise
+    os.chmod(dst_fd, stat.S_IMODE(st.st_mode))
+    os.utime(dst_fd, ns=(st.st_atime_ns, st.st_mtime_ns))
+
+# Function to copy a single file along with its permissions and timestamps, like shutil.copy2()
+def _copyfile(src, dst, reflink='auto'):
+    if reflink != 'never' and _clonefile is not None and _try_clonefile(src, dst):
+        shutil.copystat(src, dst)
+        return
+
+    src_fd = os.open(src, os.O_RDONLY | getattr(os, 'O_BINARY', 0))
+    try:
+        st = os.fstat(src_fd)
+        dst_fd = os.open(dst, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, 'O_BINARY', 0), 0o666)
+        try:
+            _fastcopy(src_fd, dst_fd, st.st_size, reflink)
+            if _FD_METADATA:
+                _copymeta(st, src_fd, dst_fd)
+        finally:
+            os.close(dst_fd)
+    finally:
+        os.close(src_fd)
+    if not _FD_METADATA:
+        shutil.copystat(src, dst)
+
+# Function to split excluded extensions into a set of plain (bytes) extensions and one regex for glob patterns
+def _compile_excludes(exclude_extensions):
+    extensions = set()
+    patterns = []
+    for ext in exclude_extensions:
+        ext = ext.strip().lstrip('.')
+        if not ext:
+            continue
+        # Plain extensions are matched by a set lookup; globs and multi-part extensions ('tar.gz') need a regex
+        if any(c in ext for c in '*?[.'):
+            patterns.append(fnmatch.translate(f"*.{ext}"))
+        else:
+            extensions.add(os.fsencode(ext.lower()))
+    regex = re.compile('|'.join(patterns), re.IGNORECASE) if patterns else None
+    return frozenset(extensions), regex
+
+# Number of files copied concurrently; copies release the GIL, so threads keep the device queue full
+MAX_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+
+# Function to check whether the destination already matches the source by size and mtime, like rsync
+def _is_unchanged(src_st, dest_file):
+    try:
+        dst_st = os.stat(dest_file)
+    except OSError:
+        return False
+    return (src_st.st_size, int(src_st.st_mtime)) == (dst_st.st_size, int(dst_st.st_mtime))
+
+# Function run on a worker thread to copy one file, handling "Access Denied" or other errors
+def _copy_task(src_file, dest_dir, dest_file, src_st, reflink, update):
+    try:
+        if update and src_st is not None and _is_unchanged(src_st, dest_file):
+            logging.info(f"Skipped unchanged file: {os.fsdecode(src_file)}")
+            return False
+        _copyfile(src_file, dest_file, reflink)
+        logging.info(f"Copied: {os.fsdecode(src_file)} to {os.fsdecode(dest_dir)}")
+        return True
+    except PermissionError:
+        logging.error(f"Access Denied: {os.fsdecode(src_file)}. Skipping...")
+    except Exception as e:
+        logging.error(f"Error copying {os.fsdecode(src_file)}: {e}")
+    return False
+
+# Number of queued files between redraws of the progress bar while its total is still growing
+PROGRESS_REFRESH_INTERVAL = 1024
+
+# Maximum number of files the walk can get ahead of the copy workers
+WORK_QUEUE_SIZE = 1024
+
+# Queued once per worker to tell it the walk has finished
+_SENTINEL = object()
+
+# Function to copy files and folders, ignoring hidden files/folders, and excluding certain file types
+def copy_files_and_folders(src, dst, exclude_extensions, reflink='auto', update=False, sort_by_inode=False):
+    total_files = 0
+    excluded, excluded_regex = _compile_excludes(exclude_extensions)
+    work = queue.Queue(maxsize=WORK_QUEUE_SIZE)
+    progress_lock = threading.Lock()
+    scan_errors = []
+
+    # Walk and copy with bytes paths; they are only decoded for logging
+    src, dst = os.fsencode(src), os.fsencode(dst)
+
+    # Bind the per-file lookups once; these loops run for every file in the tree
+    is_excluded = excluded.__contains__
+    excluded_match = excluded_regex.match if excluded_regex else None
+    put, get = work.put, work.get
+
+    # Producer: walk the tree once (which creates the destination directories) and queue files to copy
+    def produce():
+        nonlocal total_files
+        try:
+            for entry, dest_dir, dest_file in _scan(src, dst, sort_by_inode):
+                file = entry.name
+                src_file = entry.path
+                total_files += 1
+
+                # Skip files with excluded extensions
+                _, dot, ext = file.rpartition(b'.')
+                if (dot and is_excluded(ext.lower())) or (excluded_match and excluded_match(os.fsdecode(file))):
+                    logging.info(f"Skipped excluded file type: {os.fsdecode(src_file)}")
+                    continue
+
+                # The size comes from the DirEntry, which caches its stat() result
+                try:
+                    src_st = entry.stat()
+                    size = src_st.st_size
+                except OSError:
+                    src_st = None
+                    size = 0
+                with progress_lock:
+                    progress_bar.total += size
+                    if total_files % PROGRESS_REFRESH_INTERVAL == 0:
+                        progress_bar.refresh()
+
+                put((src_file, dest_dir, dest_file, src_st, size))
+        except BaseException as e:
+            scan_errors.append(e)
+        finally:
+            for _ in range(MAX_WORKERS):
+                put(_SENTINEL)
+
+    # Consumer: copy queued files until the producer says the walk is done
+    def consume():
+        copied = 0
+        while (item := get()) is not _SENTINEL:
+            src_file, dest_dir, dest_file, src_st, size = item
+            copied += _copy_task(src_file, dest_dir, dest_file, src_st, reflink, update)
+            with progress_lock:
+                progress_bar.update(size)
+        return copied
+
+    # Initialize progress bar in bytes; the total grows as the walk discovers files
+    with tqdm(total=0, unit="B", unit_scale=True, unit_divisor=1024) as progress_bar, \
+            ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        workers = [executor.submit(consume) for _ in range(MAX_WORKERS)]
+        producer = threading.Thread(target=produce, name="CopyClone-scan", daemon=True)
+        producer.start()
+        copied_files = sum(worker.result() for worker in workers)
+        producer.join()
+
+    if scan_errors:
+        raise scan_errors[0]
+
+    print(f"Copied {copied_files} files out of {total_files}. Check 'copy_log.txt' for details.")
+
+# Function to delegate the copy to robocopy on Windows; returns False if robocopy isn't available
+def robocopy_files_and_folders(src, dst, exclude_extensions):
+    robocopy = shutil.which('robocopy')
+    if robocopy is None:
+        return False
+
+    # /MT:32 copies on 32 threads, /J uses unbuffered I/O for large files and /XA:H excludes hidden files
+    cmd = [robocopy, src, dst, '/S', '/MT:32', '/J', '/NFL', '/NDL', '/NP', '/XA:H']
+    patterns = [f"*.{ext}" for ext in exclude_extensions if ext]
+    if patterns:
+        cmd += ['/XF'] + patterns
+
+    logging.info(f"Running robocopy: {subprocess.list2cmdline(cmd)}")
+    result = subprocess.run(cmd)
+
+    # Exit codes below 8 mean success (1 is "files copied OK"); 8 and above mean some copies failed
+    if result.returncode < 8:
+        logging.info(f"robocopy finished with exit code {result.returncode}")
+        print("Check 'copy_log.txt' for details.")
+    else:
+        logging.error(f"robocopy failed with exit code {result.returncode}")
+        print(f"robocopy reported errors (exit code {result.returncode}).")
+    return True
+
+# Main function to get user input and run the copy operation
+def main():
+    parser = argparse.ArgumentParser(description="Copy a directory tree, skipping hidden files and excluded file types.")
+    parser.add_argument('--engine', choices=['python', 'robocopy'], default='python',
+                        help="copy engine to use; 'robocopy' is Windows-only and falls back to 'python' elsewhere")
+    parser.add_argument('--reflink', choices=['auto', 'always', 'never'], default='auto',
+                        help="clone files on copy-on-write filesystems, like cp(1) (default: auto)")
+    parser.add_argument('--update', action='store_true',
+                        help="skip files whose destination already has the same size and modification time")
+    parser.add_argument('--sort-by-inode', action='store_true',
+                        help="copy each directory's files in inode order to reduce seeking on HDDs and network shares")
+    args = parser.parse_args()
+
+    # Get source and destination from user
+    src = input("Enter the source directory: ")
+    dst = input("Enter the destination directory: ")
+
+    # Check if source exists
+    if not os.path.exists(src):
+        print("Source directory does not exist.")
+        return
+
+    # Ask the user for file extensions to exclude
+    exclude_extensions = input("Enter file extensions to exclude (comma-separated, e.g., 'exe,sys,tmp'): ")
+    exclude_extensions = [ext.strip() for ext in exclude_extensions.split(',')]
+
+    # Start the copying process
+    print(f"Starting copy from {src} to {dst} (excluding hidden files and folders)...")
+    logging.info(f"Starting copy operation from {src} to {dst}")
+    if not (args.engine == 'robocopy' and sys.platform == 'win32'
+            and robocopy_files_and_folders(src, dst, exclude_extensions)):
+        copy_files_and_folders(src, dst, exclude_extensions, reflink=args.reflink, update=args.update,
+                               sort_by_inode=args.sort_by_inode)
+    print("Copy operation completed.")
+
+if __name__ == "__main__":
+    main()